@@ -0,0 +1,106 @@
+import csv
+import os
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+from tile_store import TileStore, ReplayServer
+from streetview_collector import StreetViewDatasetCollector
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT / "Hugging_face_test"))
+
+from streetclip import StreetCLIPGeolocator
+
+DEFAULT_CHOICES = ["France", "United States", "Japan", "Brazil", "Australia",
+                   "South Africa", "India", "Russia", "Canada", "Mexico"]
+
+
+def read_rows(csv_file):
+    """Lignes du CSV de coordonnées du collecteur (sans l'en-tête)"""
+    if not os.path.exists(csv_file):
+        return []
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def percentile(values, q):
+    """Percentile q (0-100) par rang le plus proche"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def run_load_test(store_root="dataset/tile_store", output_dir="dataset_replay", workers=8,
+                  latency=0.2, jitter=0.05, choices=DEFAULT_CHOICES, geolocator=None):
+    """
+    Test de charge de bout en bout sans appel à l'API : rejoue le store via un
+    ReplayServer avec plusieurs workers, puis lance StreetCLIP sur les images
+    récupérées
+
+    Args:
+        store_root: Dossier du TileStore à rejouer
+        output_dir: Dossier de sortie du collecteur de replay
+        workers: Nombre de requêtes en parallèle pendant le replay
+        latency, jitter: Latence simulée du serveur (secondes)
+        choices: Localisations possibles données à StreetCLIP
+        geolocator: StreetCLIPGeolocator déjà chargé (None = chargé ici)
+
+    Returns:
+        Dictionnaire avec débit et latences du replay et de l'inférence
+    """
+    store = TileStore(store_root)
+
+    with ReplayServer(store, latency=latency, jitter=jitter) as server:
+        collector = StreetViewDatasetCollector(api_key="replay", cost_per_image=0.0,
+                                               base_url=server.base_url,
+                                               dataset_dir=output_dir)
+        n_before = len(read_rows(collector.csv_file))
+
+        start = time.perf_counter()
+        fetched = collector.replay_from_store(store, workers=workers)
+        fetch_time = time.perf_counter() - start
+        server_stats = dict(server.stats)
+
+    rows = read_rows(collector.csv_file)[n_before:]
+    print(f"Replay : {fetched}/{len(store)} images en {fetch_time:.1f}s "
+          f"({fetched / max(fetch_time, 1e-9):.1f} images/s, {workers} workers) {server_stats}")
+
+    if geolocator is None:
+        geolocator = StreetCLIPGeolocator()
+
+    # Texte encodé (et mis en cache) avant de chronométrer
+    geolocator.encode_text(choices)
+
+    latencies = []
+    start = time.perf_counter()
+    for row in rows:
+        image_start = time.perf_counter()
+        geolocator.predict_location(os.path.join(collector.images_dir, row['filename']), choices)
+        if geolocator.device == "cuda":
+            torch.cuda.synchronize()
+        latencies.append(time.perf_counter() - image_start)
+    inference_time = time.perf_counter() - start
+
+    n = max(len(latencies), 1)
+    results = {
+        'fetched': fetched,
+        'workers': workers,
+        'fetch_images_per_s': fetched / max(fetch_time, 1e-9),
+        'server_stats': server_stats,
+        'inference_images_per_s': len(latencies) / max(inference_time, 1e-9),
+        'latency_mean_ms': 1000 * sum(latencies) / n,
+        'latency_p50_ms': 1000 * percentile(latencies, 50),
+        'latency_p95_ms': 1000 * percentile(latencies, 95)
+    }
+    print(f"Inférence : {results['inference_images_per_s']:.1f} images/s  "
+          f"moyenne {results['latency_mean_ms']:.1f} ms  "
+          f"p50 {results['latency_p50_ms']:.1f} ms  p95 {results['latency_p95_ms']:.1f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    run_load_test("dataset/tile_store", "dataset_replay", workers=8)
@@ -0,0 +1,378 @@
+import requests
+import json
+import os
+import csv
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import random
+
+from tile_store import TileStore, ReplayServer
+
+class StreetViewDatasetCollector:
+    def __init__(self, api_key, max_budget=300.0, cost_per_image=0.007,
+                 tile_store=None, base_url=None, dataset_dir="dataset"):
+        """
+        Initialise le collecteur de dataset Street View
+        
+        Args:
+            api_key: Votre clé API Google Cloud
+            max_budget: Budget maximum en dollars (défaut: 300$)
+            cost_per_image: Coût par image en dollars (défaut: 0.007$)
+            tile_store: TileStore consulté avant chaque requête (None = pas de cache)
+            base_url: URL de l'API (None = Google ; sinon ex: ReplayServer.base_url)
+            dataset_dir: Dossier de sortie du dataset
+        """
+        self.api_key = api_key
+        self.max_budget = max_budget
+        self.cost_per_image = cost_per_image
+        self.base_url = base_url or "https://maps.googleapis.com/maps/api/streetview"
+        self.tile_store = tile_store
+        
+        # Protège le budget, le CSV et la numérotation quand plusieurs threads téléchargent
+        self._lock = threading.Lock()
+        
+        # Créer les dossiers nécessaires
+        self.images_dir = os.path.join(dataset_dir, "images")
+        self.metadata_dir = os.path.join(dataset_dir, "metadata")
+        os.makedirs(self.images_dir, exist_ok=True)
+        os.makedirs(self.metadata_dir, exist_ok=True)
+        
+        # Fichier pour suivre le budget
+        self.budget_file = os.path.join(dataset_dir, "budget_tracker.json")
+        self.load_budget_tracker()
+        
+        # Fichier CSV pour les coordonnées
+        self.csv_file = os.path.join(dataset_dir, "coordinates.csv")
+        self.init_csv()
+    
+    def load_budget_tracker(self):
+        """Charge l'historique de consommation du budget"""
+        if os.path.exists(self.budget_file):
+            with open(self.budget_file, 'r') as f:
+                self.tracker = json.load(f)
+        else:
+            self.tracker = {
+                "total_spent": 0.0,
+                "images_downloaded": 0,
+                "cache_hits": 0,
+                "last_updated": datetime.now().isoformat(),
+                "history": []
+            }
+            self.save_budget_tracker()
+    
+    def save_budget_tracker(self):
+        """Sauvegarde l'état du budget"""
+        self.tracker["last_updated"] = datetime.now().isoformat()
+        with open(self.budget_file, 'w') as f:
+            json.dump(self.tracker, f, indent=2)
+    
+    def init_csv(self):
+        """Initialise le fichier CSV pour les coordonnées"""
+        if not os.path.exists(self.csv_file):
+            with open(self.csv_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['image_id', 'filename', 'latitude', 'longitude', 
+                               'country', 'timestamp', 'heading', 'pitch', 'fov'])
+    
+    def check_budget(self, num_images=1):
+        """Vérifie si le budget permet de télécharger num_images"""
+        projected_cost = self.tracker["total_spent"] + (num_images * self.cost_per_image)
+        remaining = self.max_budget - self.tracker["total_spent"]
+        
+        if projected_cost > self.max_budget:
+            return False, remaining
+        return True, remaining
+    
+    def get_status(self):
+        """Affiche le statut actuel du budget"""
+        remaining = self.max_budget - self.tracker["total_spent"]
+        images_remaining = int(remaining / self.cost_per_image) if self.cost_per_image else 0
+        
+        print(f"\n{'='*60}")
+        print(f"STATUT DU BUDGET")
+        print(f"{'='*60}")
+        print(f"Budget maximum:        {self.max_budget:.2f} $")
+        print(f"Dépensé:              {self.tracker['total_spent']:.2f} $")
+        print(f"Restant:              {remaining:.2f} $")
+        print(f"Images téléchargées:  {self.tracker['images_downloaded']}")
+        print(f"Images du cache:      {self.tracker.get('cache_hits', 0)}")
+        print(f"Images restantes:     {images_remaining}")
+        print(f"Pourcentage utilisé:  {(self.tracker['total_spent']/self.max_budget)*100:.1f}%")
+        print(f"{'='*60}\n")
+    
+    def _next_image_id(self):
+        """Identifiant de la prochaine image enregistrée (appelé sous self._lock)"""
+        return f"{self.tracker['images_downloaded'] + self.tracker.get('cache_hits', 0) + 1:06d}"
+    
+    def get_random_coordinates(self, region="world"):
+        """
+        Génère des coordonnées GPS aléatoires
+        
+        Args:
+            region: "world", "europe", "usa", "asia", etc.
+        """
+        regions = {
+            "world": {"lat": (-60, 70), "lon": (-180, 180)},
+            "europe": {"lat": (35, 71), "lon": (-10, 40)},
+            "usa": {"lat": (25, 49), "lon": (-125, -66)},
+            "asia": {"lat": (-10, 55), "lon": (60, 150)},
+            "oceania": {"lat": (-50, -10), "lon": (110, 180)},
+            "africa": {"lat": (-35, 37), "lon": (-20, 52)}
+        }
+        
+        bounds = regions.get(region, regions["world"])
+        lat = random.uniform(*bounds["lat"])
+        lon = random.uniform(*bounds["lon"])
+        
+        return round(lat, 6), round(lon, 6)
+    
+    def check_streetview_availability(self, lat, lon):
+        """Vérifie si Street View est disponible à ces coordonnées"""
+        if self.tile_store is not None:
+            metadata = self.tile_store.get_location_metadata(lat, lon)
+            if metadata is not None:
+                return metadata.get("status") == "OK", metadata
+        
+        metadata_url = f"{self.base_url}/metadata"
+        params = {
+            "location": f"{lat},{lon}",
+            "key": self.api_key,
+            "source": "outdoor"
+        }
+        
+        try:
+            response = requests.get(metadata_url, params=params, timeout=10)
+            data = response.json()
+            
+            if self.tile_store is not None and data.get("status") in ("OK", "ZERO_RESULTS"):
+                self.tile_store.put_location_metadata(lat, lon, data)
+            
+            if data.get("status") == "OK":
+                return True, data
+            return False, None
+        except Exception as e:
+            print(f"Erreur lors de la vérification: {e}")
+            return False, None
+    
+    def download_image(self, lat, lon, image_id, size="640x640", heading=None, 
+                      pitch=0, fov=90):
+        """
+        Télécharge une image Street View
+        
+        Args:
+            lat, lon: Coordonnées GPS
+            image_id: Identifiant unique de l'image (None = attribué à l'enregistrement)
+            size: Taille de l'image (max: 640x640)
+            heading: Direction de la caméra (0-360, None = aléatoire)
+            pitch: Angle vertical (-90 à 90)
+            fov: Champ de vision (10-120)
+        """
+        # Heading aléatoire si non spécifié
+        if heading is None:
+            heading = random.randint(0, 359)
+        
+        # Déjà dans le store local : aucune requête, aucun coût
+        if self.tile_store is not None:
+            content = self.tile_store.get(lat, lon, heading, pitch, fov, size)
+            if content is not None:
+                metadata = self.tile_store.get_location_metadata(lat, lon) or {}
+                with self._lock:
+                    image_id = image_id or self._next_image_id()
+                    self.save_image(image_id, content, lat, lon, metadata, heading, pitch, fov)
+                    self.tracker["cache_hits"] = self.tracker.get("cache_hits", 0) + 1
+                    self.save_budget_tracker()
+                print(f"♻️  Image {image_id} servie depuis le store local")
+                return True
+        
+        # Vérifier le budget
+        can_download, remaining = self.check_budget(1)
+        if not can_download:
+            print(f"⚠️  BUDGET ÉPUISÉ ! Restant: {remaining:.2f}$")
+            return False
+        
+        # Vérifier la disponibilité
+        available, metadata = self.check_streetview_availability(lat, lon)
+        if not available:
+            print(f"⚠️  Pas de Street View disponible à ({lat}, {lon})")
+            return False
+        
+        # Télécharger l'image
+        params = {
+            "location": f"{lat},{lon}",
+            "size": size,
+            "heading": heading,
+            "pitch": pitch,
+            "fov": fov,
+            "key": self.api_key,
+            "source": "outdoor"
+        }
+        
+        try:
+            response = requests.get(self.base_url, params=params, timeout=30)
+            
+            if response.status_code == 200:
+                if self.tile_store is not None:
+                    self.tile_store.put(lat, lon, heading, pitch, fov, size, response.content)
+                
+                with self._lock:
+                    image_id = image_id or self._next_image_id()
+                    self.save_image(image_id, response.content, lat, lon, metadata,
+                                    heading, pitch, fov)
+                    
+                    # Mettre à jour le budget
+                    self.tracker["total_spent"] += self.cost_per_image
+                    self.tracker["images_downloaded"] += 1
+                    self.tracker["history"].append({
+                        "image_id": image_id,
+                        "timestamp": datetime.now().isoformat(),
+                        "cost": self.cost_per_image,
+                        "lat": lat,
+                        "lon": lon
+                    })
+                    self.save_budget_tracker()
+                
+                print(f"✅ Image {image_id} téléchargée | Budget restant: {self.max_budget - self.tracker['total_spent']:.2f}$")
+                return True
+            else:
+                print(f"❌ Erreur HTTP {response.status_code}")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Erreur lors du téléchargement: {e}")
+            return False
+    
+    def save_image(self, image_id, content, lat, lon, metadata, heading, pitch, fov):
+        """Sauvegarde l'image et ajoute sa ligne dans le CSV"""
+        filename = f"streetview_{image_id}.jpg"
+        filepath = os.path.join(self.images_dir, filename)
+        
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        
+        # Sauvegarder les métadonnées dans le CSV
+        with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                image_id, filename, lat, lon,
+                metadata.get("location", {}).get("country", "Unknown"),
+                datetime.now().isoformat(),
+                heading, pitch, fov
+            ])
+    
+    def replay_from_store(self, store, delay=0.0, workers=1):
+        """
+        Redemande toutes les images d'un store à self.base_url (un ReplayServer)
+        pour tester le pipeline de bout en bout sans appel à l'API
+        
+        Le budget n'est vérifié qu'avant chaque requête : avec workers > 1 il peut
+        être dépassé de quelques images, réservez-le au replay (cost_per_image=0).
+        
+        Args:
+            store: TileStore dont on rejoue les requêtes
+            delay: Délai après chaque requête, dans chaque worker (secondes)
+            workers: Nombre de requêtes en parallèle
+            
+        Returns:
+            Nombre d'images récupérées
+        """
+        def fetch(tile):
+            lat, lon, heading, pitch, fov, size = tile
+            ok = self.download_image(lat, lon, None, size=size, heading=heading,
+                                     pitch=pitch, fov=fov)
+            time.sleep(delay)
+            return ok
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(fetch, store.tiles()))
+    
+    def collect_dataset(self, num_images, region="world", delay=1.0):
+        """
+        Collecte un dataset d'images
+        
+        Args:
+            num_images: Nombre d'images à télécharger
+            region: Région géographique
+            delay: Délai entre chaque requête (secondes)
+        """
+        print(f"\n🚀 Début de la collecte de {num_images} images depuis {region}")
+        self.get_status()
+        
+        # Vérifier si le budget est suffisant
+        can_download, remaining = self.check_budget(num_images)
+        if not can_download:
+            max_possible = int(remaining / self.cost_per_image)
+            print(f"⚠️  Budget insuffisant pour {num_images} images.")
+            print(f"Maximum possible: {max_possible} images")
+            
+            if max_possible > 0:
+                response = input(f"Télécharger {max_possible} images ? (o/n): ")
+                if response.lower() != 'o':
+                    return
+                num_images = max_possible
+            else:
+                print("❌ Budget épuisé !")
+                return
+        
+        successful = 0
+        attempts = 0
+        max_attempts = num_images * 3  # Maximum 3 essais par image souhaitée
+        
+        while successful < num_images and attempts < max_attempts:
+            attempts += 1
+            
+            # Générer des coordonnées aléatoires
+            lat, lon = self.get_random_coordinates(region)
+            
+            # Télécharger l'image
+            image_id = self._next_image_id()
+            
+            if self.download_image(lat, lon, image_id):
+                successful += 1
+                time.sleep(delay)  # Respecter les limites de taux
+            else:
+                time.sleep(0.5)  # Délai plus court en cas d'échec
+        
+        print(f"\n✅ Collecte terminée : {successful}/{num_images} images téléchargées")
+        self.get_status()
+
+
+# ===== EXEMPLE D'UTILISATION =====
+if __name__ == "__main__":
+    # CONFIGURATION
+    API_KEY = "VOTRE_CLE_API_ICI"  # ⚠️ Remplacez par votre vraie clé API
+    MAX_BUDGET = 300.0  # Budget maximum en dollars
+    
+    # True = rejoue le store local via un serveur local (aucun appel API, aucun coût)
+    REPLAY = False
+    
+    store = TileStore("dataset/tile_store")  # Évite de repayer les mêmes images
+    
+    if REPLAY:
+        with ReplayServer(store, latency=0.2, jitter=0.05) as server:
+            replay = StreetViewDatasetCollector(api_key="replay", cost_per_image=0.0,
+                                                base_url=server.base_url,
+                                                dataset_dir="dataset_replay")
+            replay.replay_from_store(store, workers=8)
+            print(server.stats)
+    else:
+        # Créer le collecteur
+        collector = StreetViewDatasetCollector(
+            api_key=API_KEY,
+            max_budget=MAX_BUDGET,
+            cost_per_image=0.007,
+            tile_store=store
+        )
+        
+        # Afficher le statut
+        collector.get_status()
+        
+        # Collecter des images
+        # Exemples:
+        collector.collect_dataset(num_images=10, region="world", delay=1.0)
+        # collector.collect_dataset(num_images=50, region="europe", delay=1.0)
+        # collector.collect_dataset(num_images=100, region="usa", delay=1.0)
+        
+        # Afficher le statut final
+        collector.get_status()
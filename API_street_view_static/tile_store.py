@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _coordinate(value, precision, wrap=False):
+    """
+    Coordonnée arrondie sous forme de texte, sans "-0.00000"
+
+    wrap=True ramène une longitude dans [-180, 180) (190 et -170 ont la même clé).
+    """
+    value = round(float(value), precision)
+    if wrap:
+        value = round((value + 180) % 360 - 180, precision)
+        if value >= 180:
+            value -= 360
+    return f"{value + 0.0:.{precision}f}"
+
+
+def tile_key(lat, lon, heading, pitch=0, fov=90, size="640x640", precision=5):
+    """
+    Clé normalisée d'une image Street View
+
+    Deux requêtes équivalentes après arrondi (5 décimales ≈ 1 m) ont la même clé.
+    """
+    return "|".join([
+        _coordinate(lat, precision),
+        _coordinate(lon, precision, wrap=True),
+        str(int(round(float(heading))) % 360),
+        str(int(round(float(pitch)))),
+        str(int(round(float(fov)))),
+        str(size)
+    ])
+
+
+def location_key(lat, lon, precision=5):
+    """Clé normalisée d'un emplacement (pour les métadonnées Street View)"""
+    return f"{_coordinate(lat, precision)}|{_coordinate(lon, precision, wrap=True)}"
+
+
+class TileStore:
+    def __init__(self, root="dataset/tile_store", precision=5):
+        """
+        Stockage local des images Street View, adressé par contenu
+
+        Args:
+            root: Dossier du store
+            precision: Nombre de décimales gardées sur lat/lon pour les clés
+        """
+        self.root = root
+        self.precision = precision
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_file = os.path.join(root, "index.jsonl")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.load_index()
+
+    def load_index(self):
+        """
+        Reconstruit l'index en rejouant le journal (une entrée JSON par ligne,
+        la dernière écriture d'une clé l'emporte)
+        """
+        self.index = {"tiles": {}, "locations": {}}
+        if not os.path.exists(self.index_file):
+            return
+
+        line = ""
+        with open(self.index_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée (arrêt brutal pendant une écriture)
+                    continue
+                self.index[entry["kind"]][entry["key"]] = entry["value"]
+
+        # Termine une ligne tronquée pour que le prochain ajout reste lisible
+        if line and not line.endswith("\n"):
+            with open(self.index_file, 'a') as f:
+                f.write("\n")
+
+    def _append(self, kind, key, value):
+        """Ajoute une entrée au journal : écriture en O(1), pas de réécriture de l'index"""
+        self.index[kind][key] = value
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps({"kind": kind, "key": key, "value": value}) + "\n")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def get(self, lat, lon, heading, pitch=0, fov=90, size="640x640"):
+        """
+        Returns:
+            Contenu de l'image (bytes) ou None si absente du store
+        """
+        key = tile_key(lat, lon, heading, pitch, fov, size, self.precision)
+        entry = self.index["tiles"].get(key)
+        if entry is None:
+            return None
+
+        path = self._object_path(entry["sha256"])
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, lat, lon, heading, pitch, fov, size, content):
+        """
+        Ajoute une image au store (un contenu identique n'est stocké qu'une fois)
+
+        Returns:
+            Empreinte sha256 du contenu
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+            key = tile_key(lat, lon, heading, pitch, fov, size, self.precision)
+            self._append("tiles", key, {
+                "sha256": digest,
+                "lat": lat,
+                "lon": lon,
+                "heading": heading,
+                "pitch": pitch,
+                "fov": fov,
+                "size": size
+            })
+        return digest
+
+    def get_location_metadata(self, lat, lon):
+        """
+        Returns:
+            Métadonnées Street View stockées pour cet emplacement, ou None
+        """
+        return self.index["locations"].get(location_key(lat, lon, self.precision))
+
+    def put_location_metadata(self, lat, lon, metadata):
+        """Stocke la réponse de l'endpoint metadata pour cet emplacement"""
+        with self._lock:
+            self._append("locations", location_key(lat, lon, self.precision), metadata)
+
+    def tiles(self):
+        """
+        Returns:
+            Liste des paramètres (lat, lon, heading, pitch, fov, size) des images stockées
+        """
+        return [
+            (t["lat"], t["lon"], t["heading"], t["pitch"], t["fov"], t["size"])
+            for t in self.index["tiles"].values()
+        ]
+
+    def __len__(self):
+        return len(self.index["tiles"])
+
+
+class ReplayServer:
+    def __init__(self, store, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+        """
+        Serveur local qui imite la Street View Static API à partir d'un TileStore
+
+        Args:
+            store: TileStore à servir
+            host, port: Adresse d'écoute (port 0 = port libre choisi par l'OS)
+            latency: Latence ajoutée à chaque réponse (secondes)
+            jitter: Variation aléatoire maximale ajoutée à la latence (secondes)
+        """
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """URL à passer au collecteur à la place de l'API Google"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/maps/api/streetview"
+
+    def _record(self, outcome):
+        """outcome : "hits", "misses" ou "errors" """
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                delay = server.latency + random.uniform(0, server.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                is_metadata = url.path.endswith("/metadata")
+
+                # Le store n'est indexé que par coordonnées numériques : une adresse
+                # ("location=Paris"), un paramètre non numérique ou absent donne une 400
+                try:
+                    location = params.get("location")
+                    if location is None:
+                        raise ValueError("missing location parameter")
+                    lat, lon = location.split(",")
+                    if is_metadata:
+                        metadata = server.store.get_location_metadata(lat, lon)
+                    else:
+                        content = server.store.get(
+                            lat, lon,
+                            params.get("heading", 0),
+                            params.get("pitch", 0),
+                            params.get("fov", 90),
+                            params.get("size", "640x640")
+                        )
+                except ValueError as e:
+                    server._record("errors")
+                    self._reply(400, "text/plain", f"Invalid request: {e}".encode())
+                    return
+
+                if is_metadata:
+                    server._record("hits" if metadata is not None else "misses")
+                    body = json.dumps(metadata or {"status": "ZERO_RESULTS"}).encode()
+                    self._reply(200, "application/json", body)
+                    return
+
+                server._record("hits" if content is not None else "misses")
+                if content is None:
+                    self._reply(404, "text/plain", b"Tile not in store")
+                else:
+                    self._reply(200, "image/jpeg", content)
+
+            def _reply(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Démarre le serveur dans un thread en arrière-plan"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"✅ Serveur de replay sur {self.base_url} ({len(self.store)} images)")
+        return self
+
+    def stop(self):
+        """Arrête le serveur"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,317 @@
+import csv
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image
+
+from streetclip import StreetCLIPGeolocator
+from cascade import CascadeGeolocator
+from regional_index import RegionalLabelIndex, load_gazetteer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+LABELS_JSON = REPO_ROOT / "dataset_2k_random_test" / "label_association" / "labels_city.json"
+SPLITS_2K = REPO_ROOT / "dataset_split" / "splits_2k.npz"
+
+sys.path.append(str(REPO_ROOT / "dataset_split"))
+
+from build_splits import load_split_manifest, get_split
+
+
+def load_2k_dataset(images_dir, labels_json=LABELS_JSON, max_images=None):
+    """
+    Charge les chemins d'images et les labels du dataset 2k (Im2GPS)
+
+    Returns:
+        (liste de (chemin, label), liste triée des labels possibles)
+    """
+    with open(labels_json, 'r', encoding='utf-8') as f:
+        labels = json.load(f)
+
+    images_dir = Path(images_dir)
+    samples = [
+        (images_dir / filename, info['city'])
+        for filename, info in sorted(labels.items())
+        if (images_dir / filename).exists()
+    ]
+    if max_images is not None:
+        samples = samples[:max_images]
+
+    choices = sorted({info['city'] for info in labels.values()})
+    return samples, choices
+
+
+def load_2k_split(images_dir, split_name, manifest_file=SPLITS_2K, max_images=None):
+    """
+    Charge un split du manifeste 2k (sans relire labels_city.json)
+
+    Returns:
+        (liste de (chemin, label), liste triée des labels possibles)
+    """
+    manifest = load_split_manifest(manifest_file)
+    images_dir = Path(images_dir)
+
+    samples = [
+        (images_dir / filename, label)
+        for filename, label in get_split(manifest, split_name)
+        if (images_dir / filename).exists()
+    ]
+    if max_images is not None:
+        samples = samples[:max_images]
+
+    return samples, manifest['label_names']
+
+
+def _synchronize(device):
+    """Attend la fin des calculs GPU pour mesurer une latence réelle"""
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def evaluate_config(geolocator, samples, choices, top_k=5, **predict_kwargs):
+    """
+    Évalue une configuration de predict_location sur des échantillons
+
+    Returns:
+        Dictionnaire avec top-1, top-k, latence moyenne (ms) et crops moyens
+    """
+    top1 = 0
+    topk = 0
+    total_time = 0.0
+    total_crops = 0
+
+    for image_path, label in samples:
+        _synchronize(geolocator.device)
+        start = time.perf_counter()
+        results = geolocator.predict_location(str(image_path), choices, top_k=top_k,
+                                              **predict_kwargs)
+        _synchronize(geolocator.device)
+        total_time += time.perf_counter() - start
+        total_crops += geolocator.last_num_crops
+
+        predicted = [location for location, _ in results]
+        top1 += predicted[0] == label
+        topk += label in predicted
+
+    n = max(len(samples), 1)
+    return {
+        'top1': top1 / n,
+        f'top{top_k}': topk / n,
+        'latency_ms': 1000 * total_time / n,
+        'mean_crops': total_crops / n
+    }
+
+
+def benchmark_tta(images_dir, max_images=None, output_csv='benchmark_tta_2k.csv'):
+    """
+    Courbe latence / précision de la TTA sur le dataset 2k
+    """
+    samples, choices = load_2k_dataset(images_dir, max_images=max_images)
+    print(f"{len(samples)} images, {len(choices)} labels possibles")
+
+    geolocator = StreetCLIPGeolocator()
+
+    configs = [
+        ('baseline', {}),
+        ('tta_1', {'tta': True, 'crop_budget': 1}),
+        ('tta_3', {'tta': True, 'crop_budget': 3}),
+        ('tta_5', {'tta': True, 'crop_budget': 5}),
+        ('tta_3_exit_0.5', {'tta': True, 'crop_budget': 3, 'early_exit_threshold': 0.5}),
+        ('tta_5_exit_0.5', {'tta': True, 'crop_budget': 5, 'early_exit_threshold': 0.5}),
+    ]
+
+    # Un passage à vide pour ne pas compter l'initialisation dans la latence
+    if samples:
+        geolocator.predict_location(str(samples[0][0]), choices)
+
+    rows = []
+    for name, kwargs in configs:
+        metrics = evaluate_config(geolocator, samples, choices, **kwargs)
+        rows.append({'config': name, **metrics})
+        print(f"  {name:18s} top1={metrics['top1']*100:5.1f}%  top5={metrics['top5']*100:5.1f}%  "
+              f"{metrics['latency_ms']:7.1f} ms/image  {metrics['mean_crops']:.2f} crops")
+
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n CSV sauvegardé: {output_csv}")
+
+    return rows
+
+
+def benchmark_cascade(images_dir, max_images=None, manifest_file=SPLITS_2K,
+                      calibration_fraction=0.3, seed=0, tolerance=0.01, **full_kwargs):
+    """
+    Calibre la cascade sur un split held-out puis mesure sur le reste :
+    fraction escaladée et latence moyenne de bout en bout vs StreetCLIP seul
+
+    Avec un manifeste de splits : calibration sur 'val', mesure sur 'test'.
+    Sinon : découpage aléatoire déterministe (calibration_fraction, seed).
+    full_kwargs : options de StreetCLIP (ex: tta=True), identiques pour la
+    calibration, la cascade et la référence StreetCLIP seul.
+    """
+    if manifest_file is not None and Path(manifest_file).exists():
+        calibration, choices = load_2k_split(images_dir, 'val', manifest_file, max_images)
+        evaluation, _ = load_2k_split(images_dir, 'test', manifest_file, max_images)
+    else:
+        samples, choices = load_2k_dataset(images_dir, max_images=max_images)
+
+        # Split held-out déterministe
+        shuffled = list(samples)
+        random.Random(seed).shuffle(shuffled)
+        n_calibration = int(len(shuffled) * calibration_fraction)
+        calibration, evaluation = shuffled[:n_calibration], shuffled[n_calibration:]
+    print(f"{len(calibration)} images de calibration, {len(evaluation)} images d'évaluation")
+
+    cascade = CascadeGeolocator()
+    cascade.calibrate_threshold(calibration, choices, tolerance=tolerance, **full_kwargs)
+
+    full_metrics = evaluate_config(cascade.full, evaluation, choices, **cascade.full_kwargs)
+
+    cascade.reset_stats()
+    top1 = 0
+    for image_path, label in evaluation:
+        results = cascade.predict_location(str(image_path), choices)
+        top1 += results[0][0] == label
+    stats = cascade.get_stats()
+    cascade_top1 = top1 / max(len(evaluation), 1)
+
+    print(f"  StreetCLIP seul   top1={full_metrics['top1']*100:5.1f}%  "
+          f"{full_metrics['latency_ms']:7.1f} ms/image")
+    print(f"  Cascade           top1={cascade_top1*100:5.1f}%  "
+          f"{stats['mean_latency_ms']:7.1f} ms/image  "
+          f"escaladé : {stats['escalated_fraction']*100:.1f}%")
+
+    return {
+        'threshold': cascade.threshold,
+        'full_top1': full_metrics['top1'],
+        'full_latency_ms': full_metrics['latency_ms'],
+        'cascade_top1': cascade_top1,
+        'cascade_latency_ms': stats['mean_latency_ms'],
+        'escalated_fraction': stats['escalated_fraction']
+    }
+
+
+def synthetic_places(n_places, n_countries=150, seed=0):
+    """
+    Lieux synthétiques à densité inégale, regroupés en "pays" irréguliers
+
+    Les lieux sont surtout concentrés autour de quelques foyers (grandes zones
+    urbaines), le reste étant dispersé. Chaque lieu appartient au pays dont le
+    centre (tiré au hasard) est le plus proche : les frontières ne suivent pas
+    la grille de l'index et un pays peut couvrir plusieurs cellules.
+
+    Les noms n'ont pas de sens pour le modèle : sert uniquement à mesurer le coût.
+    """
+    rng = random.Random(seed)
+    centers = [(rng.uniform(-55, 70), rng.uniform(-180, 180)) for _ in range(n_countries)]
+    hotspots = [(rng.uniform(-40, 60), rng.uniform(-130, 150)) for _ in range(12)]
+
+    places = []
+    for i in range(n_places):
+        if rng.random() < 0.7:
+            hot_lat, hot_lon = rng.choice(hotspots)
+            lat = min(max(rng.gauss(hot_lat, 3.0), -89.9), 89.9)
+            lon = (rng.gauss(hot_lon, 4.0) + 180) % 360 - 180
+        else:
+            lat = rng.uniform(-60, 70)
+            lon = rng.uniform(-180, 180)
+
+        # Distance en longitude repliée pour que les pays traversent l'antiméridien
+        country = min(range(n_countries), key=lambda c: (
+            (centers[c][0] - lat) ** 2
+            + (((centers[c][1] - lon + 180) % 360 - 180) * math.cos(math.radians(lat))) ** 2
+        ))
+        places.append({
+            'label': f"Lieu {i}",
+            'country': f"Pays {country}",
+            'lat': lat,
+            'lon': lon
+        })
+    return places
+
+
+def benchmark_pruning(images_dir, gazetteer_csv=None, sizes=(1000, 5000, 20000),
+                      max_images=50, top_cells=5, top_countries=3, max_leaf_size=256,
+                      output_csv='benchmark_pruning_2k.csv'):
+    """
+    Coût par image de l'élagage régional vs le scoring de tous les lieux,
+    quand le nombre de lieux candidats augmente
+
+    Les embeddings texte et image sont précalculés hors chronomètre : seule la
+    partie qui dépend du nombre de lieux est mesurée (sélection des feuilles +
+    scoring + top-k d'un côté, scoring de tous les lieux + top-k de l'autre).
+    """
+    samples, _ = load_2k_dataset(images_dir, max_images=max_images)
+    geolocator = StreetCLIPGeolocator()
+
+    if gazetteer_csv is not None:
+        places = load_gazetteer(gazetteer_csv)
+        random.Random(0).shuffle(places)
+    else:
+        places = synthetic_places(max(sizes))
+
+    # Chaque image n'est encodée qu'une fois, pour toutes les tailles
+    image_embeds = [geolocator.encode_images([Image.open(path)]) for path, _ in samples]
+
+    rows = []
+    for size in sizes:
+        index = RegionalLabelIndex(geolocator, places[:size], max_leaf_size=max_leaf_size)
+
+        full_time = 0.0
+        pruned_time = 0.0
+        pruned_scored = 0
+
+        for embeds in image_embeds:
+            # Scoring de tous les lieux
+            _synchronize(geolocator.device)
+            start = time.perf_counter()
+            probs = geolocator.score(embeds, index.label_embeds)[0]
+            torch.topk(probs, k=min(5, len(probs)))
+            _synchronize(geolocator.device)
+            full_time += time.perf_counter() - start
+
+            # Élagage régional (passe grossière par pays, sans prior)
+            _synchronize(geolocator.device)
+            start = time.perf_counter()
+            leaves = index.select_leaves(embeds, None, top_cells, top_countries)
+            probs = geolocator.probabilities(index.leaf_similarities(embeds, leaves))[0]
+            torch.topk(probs, k=min(5, len(probs)))
+            _synchronize(geolocator.device)
+            pruned_time += time.perf_counter() - start
+            pruned_scored += len(probs)
+
+        n = max(len(samples), 1)
+        row = {
+            'num_places': len(index.labels),
+            'full_scored': len(index.labels),
+            'full_latency_ms': 1000 * full_time / n,
+            'pruned_scored': pruned_scored / n,
+            'pruned_latency_ms': 1000 * pruned_time / n
+        }
+        rows.append(row)
+        print(f"  {row['num_places']:6d} lieux  complet : {row['full_latency_ms']:7.2f} ms/image  "
+              f"élagué : {row['pruned_scored']:8.1f} lieux scorés, "
+              f"{row['pruned_latency_ms']:7.2f} ms/image")
+
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n CSV sauvegardé: {output_csv}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    # Remplacez par le chemin vers votre dossier d'images
+    IMAGES_DIR = "C:/Users/fanny/OneDrive/Bureau/Cours_CS/GeoGuesserIA/GeoGuesserIA/dataset/2k_random_test"
+
+    benchmark_tta(IMAGES_DIR)
+    benchmark_cascade(IMAGES_DIR)
+    benchmark_pruning(IMAGES_DIR)
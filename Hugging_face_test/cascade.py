@@ -0,0 +1,190 @@
+from PIL import Image
+import time
+from pathlib import Path
+
+import torch
+
+from streetclip import StreetCLIPGeolocator
+
+
+class CascadeGeolocator:
+    def __init__(self, fast_model_name="openai/clip-vit-base-patch32", threshold=0.5,
+                 criterion="margin"):
+        """
+        Cascade à deux étages : un petit CLIP rapide d'abord, StreetCLIP (ViT-L)
+        uniquement quand le premier étage n'est pas sûr de lui
+
+        Args:
+            fast_model_name: Checkpoint CLIP utilisé comme premier étage
+            threshold: Confiance minimale du premier étage pour ne pas escalader
+            criterion: "margin" (top1 - top2) ou "top1" (probabilité du top 1)
+        """
+        self.fast = StreetCLIPGeolocator(model_name=fast_model_name)
+        self.full = StreetCLIPGeolocator()
+        self.threshold = threshold
+        self.criterion = criterion
+
+        # Options de StreetCLIP en cas d'escalade (fixées par calibrate_threshold)
+        self.full_kwargs = {}
+
+        self.last_escalated = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Remet à zéro les compteurs d'escalade et de latence"""
+        self.stats = {
+            "requests": 0,
+            "escalated": 0,
+            "total_time": 0.0
+        }
+
+    def get_stats(self):
+        """
+        Returns:
+            Dictionnaire avec le nombre de requêtes, la fraction escaladée
+            et la latence moyenne de bout en bout (ms)
+        """
+        n = max(self.stats["requests"], 1)
+        return {
+            "requests": self.stats["requests"],
+            "escalated_fraction": self.stats["escalated"] / n,
+            "mean_latency_ms": 1000 * self.stats["total_time"] / n
+        }
+
+    def confidence(self, probs):
+        """Confiance du premier étage selon le critère choisi"""
+        top = torch.topk(probs, k=min(2, probs.shape[-1])).values
+        if self.criterion == "top1" or top.shape[-1] < 2:
+            return top[0].item()
+        return (top[0] - top[1]).item()
+
+    def _fast_probs(self, image, choices):
+        """Probabilités du premier étage pour une image"""
+        image_embeds = self.fast.encode_images([image])
+        text_embeds = self.fast.encode_text(choices)
+        return self.fast.score(image_embeds, text_embeds)[0]
+
+    def predict_location(self, image, choices, top_k=5, **full_kwargs):
+        """
+        Prédit la localisation en n'appelant StreetCLIP que si nécessaire
+
+        Args:
+            image: PIL Image ou chemin vers l'image
+            choices: Liste de localisations possibles
+            top_k: Nombre de prédictions à retourner
+            full_kwargs: Options passées à StreetCLIPGeolocator.predict_location
+                en cas d'escalade (tta, crop_budget, ...), en plus de celles
+                utilisées lors de la calibration
+
+        Returns:
+            Liste de tuples (location, probabilité)
+        """
+        start = time.perf_counter()
+
+        if isinstance(image, (str, Path)):
+            image = Image.open(image)
+
+        probs = self._fast_probs(image, choices)
+
+        if self.confidence(probs) >= self.threshold:
+            top_indices = torch.argsort(probs, descending=True)[:top_k]
+            results = [(choices[idx], probs[idx].item()) for idx in top_indices]
+            self.last_escalated = False
+        else:
+            results = self.full.predict_location(image, choices, top_k=top_k,
+                                                 **{**self.full_kwargs, **full_kwargs})
+            self.last_escalated = True
+            self.stats["escalated"] += 1
+
+        self.stats["requests"] += 1
+        self.stats["total_time"] += time.perf_counter() - start
+        return results
+
+    def calibrate_threshold(self, samples, choices, tolerance=0.01, **full_kwargs):
+        """
+        Calibre le seuil sur un split held-out
+
+        Choisit le seuil le plus bas (donc le moins d'escalades) tel que la
+        précision top-1 de la cascade reste à moins de `tolerance` de celle
+        de StreetCLIP seul sur ce split.
+
+        Args:
+            samples: Liste de (image ou chemin, label)
+            choices: Liste de localisations possibles
+            tolerance: Perte de précision top-1 acceptée
+            full_kwargs: Options de StreetCLIP (tta, crop_budget, ...) ; elles sont
+                gardées et réutilisées par predict_location pour que le seuil soit
+                calibré sur le second étage réellement déployé
+
+        Returns:
+            Dictionnaire avec le seuil retenu, la fraction escaladée
+            et les précisions cascade / StreetCLIP seul sur le split
+        """
+        self.full_kwargs = dict(full_kwargs)
+
+        confidences = []
+        fast_correct = []
+        full_correct = []
+
+        for image, label in samples:
+            if isinstance(image, (str, Path)):
+                image = Image.open(image)
+
+            probs = self._fast_probs(image, choices)
+            confidences.append(self.confidence(probs))
+            fast_correct.append(choices[int(torch.argmax(probs))] == label)
+
+            full_top = self.full.predict_location(image, choices, top_k=1, **self.full_kwargs)
+            full_correct.append(full_top[0][0] == label)
+
+        n = max(len(samples), 1)
+        full_accuracy = sum(full_correct) / n
+
+        # Candidats : chaque confiance observée (+ l'infini = toujours escalader)
+        best = {
+            "threshold": float("inf"),
+            "escalated_fraction": 1.0,
+            "cascade_accuracy": full_accuracy
+        }
+        for threshold in sorted(set(confidences)):
+            accepted = [c >= threshold for c in confidences]
+            correct = sum(
+                fast if keep else full
+                for keep, fast, full in zip(accepted, fast_correct, full_correct)
+            )
+            accuracy = correct / n
+            if accuracy >= full_accuracy - tolerance:
+                best = {
+                    "threshold": threshold,
+                    "escalated_fraction": 1 - sum(accepted) / n,
+                    "cascade_accuracy": accuracy
+                }
+                break
+
+        self.threshold = best["threshold"]
+        best["full_accuracy"] = full_accuracy
+
+        print(f"✅ Seuil calibré ({self.criterion}) : {self.threshold:.3f} | "
+              f"escaladé : {best['escalated_fraction']*100:.1f}% | "
+              f"précision cascade : {best['cascade_accuracy']*100:.1f}% "
+              f"(StreetCLIP seul : {full_accuracy*100:.1f}%)")
+        return best
+
+
+def example_cascade():
+
+    geolocator = CascadeGeolocator(threshold=0.3)
+
+    image_path = "sanfrancisco.jpeg"  # Remplacez par votre image
+    cities = ["San Jose", "San Diego", "Los Angeles", "Las Vegas", "San Francisco"]
+    results = geolocator.predict_location(image_path, cities)
+
+    stage = "StreetCLIP" if geolocator.last_escalated else "premier étage"
+    print(f"  Prédiction par : {stage}")
+    for city, prob in results:
+        print(f"  {city:20s} {prob*100:6.2f}%")
+
+
+if __name__ == "__main__":
+
+    example_cascade()
@@ -0,0 +1,282 @@
+import csv
+import math
+import numbers
+from collections import defaultdict
+
+import torch
+
+
+def load_gazetteer(csv_file):
+    """
+    Charge une liste de lieux depuis un CSV (colonnes city, country, lat, lon)
+
+    Returns:
+        Liste de dicts {'label', 'country', 'lat', 'lon'}
+    """
+    places = []
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            places.append({
+                'label': row.get('label') or row['city'],
+                'country': row['country'],
+                'lat': float(row['lat']),
+                'lon': float(row['lon'])
+            })
+    return places
+
+
+def _bbox_intersects(bounds, bbox):
+    """
+    Une zone (lat_min, lat_max, lon_min, lon_max) intersecte-t-elle la bbox ?
+
+    Si lon_min > lon_max dans la bbox, elle traverse l'antiméridien :
+    on prend [lon_min, 180] ∪ [-180, lon_max].
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    if bounds[1] < lat_min or bounds[0] > lat_max:
+        return False
+    if lon_min <= lon_max:
+        return bounds[3] >= lon_min and bounds[2] <= lon_max
+    return bounds[3] >= lon_min or bounds[2] <= lon_max
+
+
+class RegionalLabelIndex:
+    def __init__(self, geolocator, places, cell_size=10.0, max_leaf_size=256,
+                 max_depth=12, batch_size=256):
+        """
+        Pré-range les lieux dans une grille géographique, puis découpe chaque
+        cellule trop dense en 4 (quadtree) jusqu'à avoir au plus max_leaf_size
+        lieux par feuille
+
+        Les embeddings sont rangés dans une seule matrice, dans l'ordre des
+        feuilles : les lieux de n'importe quel noeud forment une tranche contiguë.
+
+        Args:
+            geolocator: StreetCLIPGeolocator utilisé pour encoder les labels
+            places: Liste de dicts {'label', 'country', 'lat', 'lon'}
+            cell_size: Taille des cellules de la grille de départ (degrés)
+            max_leaf_size: Nombre maximum de lieux par feuille
+            max_depth: Profondeur maximale du quadtree (lieux aux mêmes coordonnées)
+            batch_size: Nombre de labels encodés par batch
+        """
+        self.cell_size = cell_size
+        self.max_leaf_size = max_leaf_size
+        self.max_depth = max_depth
+        self.labels = [p['label'] for p in places]
+        self.places = places
+
+        # Embeddings de tous les labels, calculés une seule fois
+        self.label_embeds = self._encode(geolocator, self.labels, batch_size)
+
+        # Noeuds du quadtree (listes parallèles, indexées par id de noeud)
+        self.node_bounds = []
+        self.node_children = []
+        self.node_countries = []
+        self.node_range = []
+        self.order = []
+
+        cell_members = defaultdict(list)
+        for idx, place in enumerate(places):
+            cell_members[self.cell_of(place['lat'], place['lon'])].append(idx)
+
+        self.cells = sorted(cell_members)
+        self.cell_nodes = {}
+        for row, col in self.cells:
+            bounds = (row * cell_size - 90, (row + 1) * cell_size - 90,
+                      col * cell_size - 180, (col + 1) * cell_size - 180)
+            self.cell_nodes[(row, col)] = self._build_node(cell_members[(row, col)], bounds, 0)
+
+        # Matrice unique dans l'ordre des feuilles (copiée une seule fois, ici)
+        self.label_order = torch.tensor(self.order, dtype=torch.long)
+        self.ordered_embeds = self.label_embeds[
+            self.label_order.to(self.label_embeds.device)].contiguous()
+
+        # Prototype de chaque noeud (moyenne normalisée de ses labels) pour les classer
+        prototypes = torch.stack([
+            self.ordered_embeds[start:end].mean(dim=0) for start, end in self.node_range
+        ])
+        self.node_prototypes = prototypes / prototypes.norm(dim=-1, keepdim=True)
+
+        # Passe grossière par pays
+        country_cells = defaultdict(set)
+        for cell, node in self.cell_nodes.items():
+            for country in self.node_countries[node]:
+                country_cells[country].add(cell)
+        self.countries = sorted(country_cells)
+        self.country_cells = {country: sorted(cells) for country, cells in country_cells.items()}
+        self.country_embeds = self._encode(geolocator, self.countries, batch_size)
+
+        n_leaves = sum(1 for children in self.node_children if not children)
+        print(f"✅ Index régional : {len(self.labels)} lieux, {len(self.cells)} cellules, "
+              f"{n_leaves} feuilles, {len(self.countries)} pays")
+
+    @staticmethod
+    def _encode(geolocator, texts, batch_size):
+        """Encode une longue liste de textes par batches"""
+        return torch.cat([
+            geolocator.encode_text(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ])
+
+    def _build_node(self, indices, bounds, depth):
+        """Crée un noeud (et ses enfants si trop de lieux), en ordre DFS"""
+        node = len(self.node_bounds)
+        self.node_bounds.append(bounds)
+        self.node_children.append([])
+        self.node_countries.append({self.places[i]['country'] for i in indices})
+        self.node_range.append(None)
+        start = len(self.order)
+
+        if len(indices) > self.max_leaf_size and depth < self.max_depth:
+            lat_min, lat_max, lon_min, lon_max = bounds
+            lat_mid = (lat_min + lat_max) / 2
+            lon_mid = (lon_min + lon_max) / 2
+            quadrants = defaultdict(list)
+            for i in indices:
+                quadrants[(self.places[i]['lat'] >= lat_mid,
+                           self.places[i]['lon'] >= lon_mid)].append(i)
+
+            for north, east in sorted(quadrants):
+                child_bounds = (lat_mid if north else lat_min, lat_max if north else lat_mid,
+                                lon_mid if east else lon_min, lon_max if east else lon_mid)
+                child = self._build_node(quadrants[(north, east)], child_bounds, depth + 1)
+                self.node_children[node].append(child)
+        else:
+            self.order.extend(indices)
+
+        self.node_range[node] = (start, len(self.order))
+        return node
+
+    def cell_of(self, lat, lon):
+        """Cellule (ligne, colonne) de la grille de départ contenant un point"""
+        return (math.floor((lat + 90) / self.cell_size),
+                math.floor((lon + 180) / self.cell_size))
+
+    def cells_in_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Cellules non vides qui intersectent une bounding box
+
+        Si lon_min > lon_max, la bbox traverse l'antiméridien (Fidji, Pacifique) :
+        on prend [lon_min, 180] ∪ [-180, lon_max].
+        """
+        bbox = (lat_min, lat_max, lon_min, lon_max)
+        return [
+            cell for cell in self.cells
+            if _bbox_intersects(self.node_bounds[self.cell_nodes[cell]], bbox)
+        ]
+
+    def _parse_prior(self, image_embeds, prior, top_countries):
+        """
+        Returns:
+            (pays retenus ou None, bbox ou None)
+        """
+        if isinstance(prior, str):
+            prior = [prior]
+
+        if prior is None:
+            scores = (image_embeds @ self.country_embeds.t())[0]
+            k = min(top_countries, len(self.countries))
+            prior = [self.countries[idx] for idx in torch.topk(scores, k).indices.tolist()]
+
+        if len(prior) == 4 and all(isinstance(v, numbers.Real) for v in prior):
+            return None, tuple(prior)
+        return set(prior), None
+
+    def candidate_cells(self, image_embeds, prior=None, top_countries=3):
+        """
+        Cellules de départ candidates selon le prior
+
+        Args:
+            image_embeds: Embedding normalisé de l'image (1, dim)
+            prior: None (passe grossière par pays), nom de pays, liste de pays
+                ou bounding box (lat_min, lat_max, lon_min, lon_max)
+            top_countries: Nombre de pays gardés par la passe grossière
+
+        Returns:
+            Liste de cellules
+        """
+        countries, bbox = self._parse_prior(image_embeds, prior, top_countries)
+        if bbox is not None:
+            return self.cells_in_bbox(*bbox)
+
+        cells = set()
+        for country in countries:
+            cells.update(self.country_cells.get(country, []))
+        return sorted(cells)
+
+    def _matches_prior(self, node, countries, bbox):
+        if bbox is not None:
+            return _bbox_intersects(self.node_bounds[node], bbox)
+        return bool(self.node_countries[node] & countries)
+
+    def _best_nodes(self, image_embeds, nodes, k):
+        """Les k noeuds dont le prototype est le plus proche de l'image"""
+        if len(nodes) <= k:
+            return nodes
+        positions = torch.tensor(nodes, device=self.node_prototypes.device)
+        scores = (image_embeds @ self.node_prototypes[positions].t())[0]
+        return [nodes[i] for i in torch.topk(scores, k).indices.tolist()]
+
+    def select_leaves(self, image_embeds, prior=None, top_cells=5, top_countries=3):
+        """
+        Feuilles dont les lieux seront scorés
+
+        Descente en faisceau dans le quadtree : à chaque niveau on ne garde que
+        les top_cells meilleurs noeuds (prototypes), puis on développe leurs
+        enfants compatibles avec le prior. Le coût ne dépend que de top_cells,
+        de max_leaf_size et de la profondeur, pas du nombre total de lieux.
+
+        Returns:
+            Liste d'ids de feuilles
+        """
+        countries, bbox = self._parse_prior(image_embeds, prior, top_countries)
+
+        if bbox is not None:
+            cells = self.cells_in_bbox(*bbox)
+        else:
+            cells = sorted({cell for country in countries
+                            for cell in self.country_cells.get(country, [])})
+
+        if not cells:
+            # Prior vide (pays inconnu, bbox hors des données) : toutes les cellules
+            cells = self.cells
+            countries, bbox = set(self.countries), None
+
+        frontier = self._best_nodes(image_embeds, [self.cell_nodes[c] for c in cells], top_cells)
+        while any(self.node_children[node] for node in frontier):
+            expanded = []
+            for node in frontier:
+                children = self.node_children[node]
+                if not children:
+                    expanded.append(node)
+                    continue
+                matching = [c for c in children if self._matches_prior(c, countries, bbox)]
+                expanded.extend(matching or children)
+            frontier = self._best_nodes(image_embeds, expanded, top_cells)
+
+        return frontier
+
+    def leaf_similarities(self, image_embeds, leaves):
+        """
+        Similarités image / lieux des feuilles (tranches de la matrice, sans copie)
+
+        Returns:
+            Tensor (1, nb_lieux_des_feuilles)
+        """
+        return torch.cat([
+            image_embeds @ self.ordered_embeds[start:end].t()
+            for start, end in (self.node_range[leaf] for leaf in leaves)
+        ], dim=1)
+
+    def label_at(self, leaves, position):
+        """Label du lieu à la position `position` de leaf_similarities(leaves)"""
+        for leaf in leaves:
+            start, end = self.node_range[leaf]
+            if position < end - start:
+                return self.labels[self.order[start + position]]
+            position -= end - start
+        raise IndexError(position)
+
+    def num_labels(self, leaves):
+        """Nombre de lieux contenus dans les feuilles"""
+        return sum(end - start for start, end in (self.node_range[leaf] for leaf in leaves))
@@ -3,21 +3,227 @@ import requests
 from transformers import CLIPProcessor, CLIPModel
 import torch
 import json
+import math
 from pathlib import Path
 
+from regional_index import RegionalLabelIndex
+
+
+def extract_crops(image, n_crops=3):
+    """
+    Découpe une image en plusieurs crops carrés pour la TTA (test-time augmentation)
+    
+    - Image large (panorama) : crop central, puis les autres répartis de part et
+      d'autre du centre jusqu'aux bords (un de plus à gauche si leur nombre est impair)
+    - Image haute : crops répartis de haut en bas
+    - Image ~carrée : image entière puis les 4 coins (80% du côté)
+    
+    Args:
+        image: PIL Image
+        n_crops: Nombre maximum de crops à extraire
+        
+    Returns:
+        Liste de PIL Images, le crop central en premier
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    side = min(width, height)
+    long_side = max(width, height)
+    
+    if n_crops <= 1:
+        left = (width - side) // 2
+        top = (height - side) // 2
+        return [image.crop((left, top, left + side, top + side))]
+    
+    boxes = []
+    if long_side / side >= 1.2:
+        # Inutile d'avoir plus de crops que de positions réellement différentes
+        n = min(n_crops, math.ceil(long_side / side) + 1)
+        span = long_side - side
+        
+        # Le vrai crop central d'abord (utilisé pour l'early-exit)
+        center = span // 2
+        
+        # Les n-1 autres répartis régulièrement de chaque côté du centre,
+        # le plus éloigné de chaque côté étant collé au bord
+        n_left = math.ceil((n - 1) / 2)
+        n_right = (n - 1) - n_left
+        others = [round(center * (n_left - j) / n_left) for j in range(1, n_left + 1)]
+        others += [round(center + (span - center) * j / n_right) for j in range(1, n_right + 1)]
+        
+        for offset in [center] + others:
+            if width >= height:
+                boxes.append((offset, 0, offset + side, side))
+            else:
+                boxes.append((0, offset, side, offset + side))
+    else:
+        left = (width - side) // 2
+        top = (height - side) // 2
+        boxes.append((left, top, left + side, top + side))
+        
+        corner = int(side * 0.8)
+        corners = [
+            (0, 0),
+            (width - corner, 0),
+            (0, height - corner),
+            (width - corner, height - corner)
+        ]
+        for x, y in corners[:n_crops - 1]:
+            boxes.append((x, y, x + corner, y + corner))
+    
+    return [image.crop(box) for box in boxes]
+
+
 class StreetCLIPGeolocator:
-    def __init__(self):
-        """Initialise le modèle StreetCLIP"""
+    def __init__(self, model_name="geolocal/StreetCLIP"):
+        """
+        Initialise le modèle StreetCLIP
+        
+        Args:
+            model_name: Checkpoint CLIP Hugging Face (StreetCLIP par défaut,
+                un CLIP plus petit peut servir de premier étage rapide)
+        """
         
-        self.model = CLIPModel.from_pretrained("geolocal/StreetCLIP")
-        self.processor = CLIPProcessor.from_pretrained("geolocal/StreetCLIP")
+        self.model = CLIPModel.from_pretrained(model_name)
+        self.processor = CLIPProcessor.from_pretrained(model_name)
         
         # Utiliser GPU si disponible
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model.to(self.device)
+        
+        # Cache des embeddings texte (les choix sont souvent les mêmes d'une image à l'autre)
+        self._text_cache_key = None
+        self._text_cache = None
+        
+        # Nombre de crops réellement scorés lors du dernier appel en mode TTA
+        self.last_num_crops = 1
+        
+        # Nombre de lieux scorés lors du dernier appel avec élagage régional
+        self.last_num_scored = 0
         print(f"✅ Modèle chargé sur {self.device}")
     
-    def predict_location(self, image, choices, top_k=5):
+    def encode_text(self, choices):
+        """
+        Calcule les embeddings texte normalisés des choix (mis en cache)
+        
+        Returns:
+            Tensor (nb_choix, dim)
+        """
+        key = tuple(choices)
+        if key == self._text_cache_key:
+            return self._text_cache
+        
+        inputs = self.processor(text=list(choices), return_tensors="pt", padding=True)
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        with torch.no_grad():
+            text_embeds = self.model.get_text_features(**inputs)
+        text_embeds = text_embeds / text_embeds.norm(dim=-1, keepdim=True)
+        
+        self._text_cache_key = key
+        self._text_cache = text_embeds
+        return text_embeds
+    
+    def encode_images(self, images):
+        """
+        Calcule les embeddings image normalisés, en un seul batch
+        
+        Returns:
+            Tensor (nb_images, dim)
+        """
+        inputs = self.processor(images=images, return_tensors="pt")
+        pixel_values = inputs["pixel_values"].to(self.device)
+        
+        with torch.no_grad():
+            image_embeds = self.model.get_image_features(pixel_values=pixel_values)
+        return image_embeds / image_embeds.norm(dim=-1, keepdim=True)
+    
+    def score(self, image_embeds, text_embeds):
+        """
+        Probabilités (softmax) de chaque choix pour chaque image
+        
+        Returns:
+            Tensor (nb_images, nb_choix)
+        """
+        return self.probabilities(image_embeds @ text_embeds.t())
+    
+    def probabilities(self, similarities):
+        """
+        Softmax des similarités cosinus, à la température apprise par CLIP
+        
+        Returns:
+            Tensor de même forme que similarities
+        """
+        with torch.no_grad():
+            logits = self.model.logit_scale.exp() * similarities
+        return logits.softmax(dim=-1)
+    
+    def _predict_tta(self, image, choices, crop_budget, early_exit_threshold, aggregation):
+        """
+        Score plusieurs crops d'une même image et agrège les probabilités
+        
+        Returns:
+            Tensor (nb_choix,) des probabilités agrégées
+        """
+        crops = extract_crops(image, crop_budget)
+        text_embeds = self.encode_text(choices)
+        
+        if early_exit_threshold is not None and len(crops) > 1:
+            # Le crop central seul d'abord : s'il est déjà confiant, on s'arrête là
+            first_probs = self.score(self.encode_images(crops[:1]), text_embeds)
+            if first_probs[0].max().item() >= early_exit_threshold:
+                self.last_num_crops = 1
+                return first_probs[0]
+            
+            # Sinon les crops restants en un seul batch
+            other_probs = self.score(self.encode_images(crops[1:]), text_embeds)
+            crop_probs = torch.cat([first_probs, other_probs], dim=0)
+        else:
+            crop_probs = self.score(self.encode_images(crops), text_embeds)
+        
+        self.last_num_crops = len(crops)
+        
+        if aggregation == "max":
+            probs = crop_probs.max(dim=0).values
+            return probs / probs.sum()
+        return crop_probs.mean(dim=0)
+    
+    def predict_location_pruned(self, image, index, prior=None, top_k=5, top_cells=5,
+                                top_countries=3):
+        """
+        Prédit la localisation en ne scorant que les lieux des meilleures
+        cellules géographiques d'un RegionalLabelIndex
+        
+        Args:
+            image: PIL Image ou chemin vers l'image
+            index: RegionalLabelIndex construit avec ce geolocator
+            prior: None (passe grossière par pays), nom de pays, liste de pays
+                ou bounding box (lat_min, lat_max, lon_min, lon_max)
+            top_k: Nombre de prédictions à retourner
+            top_cells: Nombre de feuilles du quadtree dont les lieux sont scorés
+            top_countries: Nombre de pays gardés par la passe grossière
+            
+        Returns:
+            Liste de tuples (location, probabilité)
+        """
+        if isinstance(image, (str, Path)):
+            image = Image.open(image)
+        
+        image_embeds = self.encode_images([image])
+        leaves = index.select_leaves(image_embeds, prior, top_cells, top_countries)
+        
+        # Softmax restreinte aux lieux des feuilles retenues
+        probs = self.probabilities(index.leaf_similarities(image_embeds, leaves))[0]
+        self.last_num_scored = len(probs)
+        
+        top = torch.topk(probs, k=min(top_k, len(probs)))
+        return [
+            (index.label_at(leaves, pos), prob)
+            for pos, prob in zip(top.indices.tolist(), top.values.tolist())
+        ]
+    
+    def predict_location(self, image, choices, top_k=5, tta=False, crop_budget=3,
+                         early_exit_threshold=None, aggregation="mean"):
         """
         Prédit la localisation d'une image parmi plusieurs choix
         
@@ -25,30 +231,33 @@ class StreetCLIPGeolocator:
             image: PIL Image ou chemin vers l'image
             choices: Liste de localisations possibles (villes, pays, régions)
             top_k: Nombre de prédictions à retourner
+            tta: Si True, score plusieurs crops de l'image au lieu du seul crop central
+            crop_budget: Nombre maximum de crops par image en mode TTA
+            early_exit_threshold: Probabilité top-1 du crop central au-delà de laquelle
+                les autres crops ne sont pas scorés (None = toujours tous les crops)
+            aggregation: "mean" ou "max" pour combiner les scores des crops
             
         Returns:
             Liste de tuples (location, probabilité)
         """
+        if aggregation not in ("mean", "max"):
+            raise ValueError(f"aggregation inconnue : {aggregation!r} (attendu 'mean' ou 'max')")
+        
         # Charger l'image si c'est un chemin
         if isinstance(image, (str, Path)):
             image = Image.open(image)
         
-        # Préparer les inputs
-        inputs = self.processor(
-            text=choices,
-            images=image,
-            return_tensors="pt",
-            padding=True
-        )
+        if tta:
+            probs = self._predict_tta(image, choices, crop_budget,
+                                      early_exit_threshold, aggregation)
+            top_indices = torch.argsort(probs, descending=True)[:top_k]
+            return [(choices[idx], probs[idx].item()) for idx in top_indices]
         
-        # Déplacer sur le bon device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        self.last_num_crops = 1
         
-        # Prédiction
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits_per_image = outputs.logits_per_image
-            probs = logits_per_image.softmax(dim=1)[0]
+        # Mêmes logits que self.model(**inputs), mais les embeddings texte sont en cache
+        image_embeds = self.encode_images([image])
+        probs = self.score(image_embeds, self.encode_text(choices))[0]
         
         # Trier par probabilité décroissante
         top_indices = torch.argsort(probs, descending=True)[:top_k]
@@ -78,6 +287,56 @@ def example_1_basic_usage():
         print(f"  {city:20s} {prob*100:6.2f}%")
 
 
+def example_2_tta():
+    
+    geolocator = StreetCLIPGeolocator()
+    
+    url = "https://huggingface.co/geolocal/StreetCLIP/resolve/main/sanfrancisco.jpeg"
+    image = Image.open(requests.get(url, stream=True).raw)
+    
+    # Plusieurs crops scorés en un seul batch, arrêt anticipé si le centre suffit
+    cities = ["San Jose", "San Diego", "Los Angeles", "Las Vegas", "San Francisco"]
+    results = geolocator.predict_location(image, cities, tta=True, crop_budget=3,
+                                          early_exit_threshold=0.8)
+    
+    print(f"  ({geolocator.last_num_crops} crop(s) utilisé(s))")
+    for city, prob in results:
+        print(f"  {city:20s} {prob*100:6.2f}%")
+
+
+def example_3_regional_pruning():
+    
+    geolocator = StreetCLIPGeolocator()
+    
+    url = "https://huggingface.co/geolocal/StreetCLIP/resolve/main/sanfrancisco.jpeg"
+    image = Image.open(requests.get(url, stream=True).raw)
+    
+    # Petit gazetteer (en pratique : load_gazetteer sur un CSV de milliers de villes)
+    places = [
+        {'label': "San Francisco", 'country': "United States", 'lat': 37.77, 'lon': -122.42},
+        {'label': "San Jose", 'country': "United States", 'lat': 37.34, 'lon': -121.89},
+        {'label': "Los Angeles", 'country': "United States", 'lat': 34.05, 'lon': -118.24},
+        {'label': "San Diego", 'country': "United States", 'lat': 32.72, 'lon': -117.16},
+        {'label': "Las Vegas", 'country': "United States", 'lat': 36.17, 'lon': -115.14},
+        {'label': "Paris", 'country': "France", 'lat': 48.86, 'lon': 2.35},
+        {'label': "Lyon", 'country': "France", 'lat': 45.76, 'lon': 4.84},
+        {'label': "London", 'country': "United Kingdom", 'lat': 51.51, 'lon': -0.13},
+        {'label': "Tokyo", 'country': "Japan", 'lat': 35.68, 'lon': 139.69},
+        {'label': "Osaka", 'country': "Japan", 'lat': 34.69, 'lon': 135.50},
+        {'label': "Sydney", 'country': "Australia", 'lat': -33.87, 'lon': 151.21},
+        {'label': "Suva", 'country': "Fiji", 'lat': -18.14, 'lon': 178.44},
+    ]
+    index = RegionalLabelIndex(geolocator, places, cell_size=10.0)
+    
+    # Sans prior (passe grossière par pays), avec un pays, puis avec une bounding box
+    for prior in [None, "United States", (30.0, 40.0, -125.0, -110.0)]:
+        results = geolocator.predict_location_pruned(image, index, prior=prior, top_k=3,
+                                                     top_cells=2, top_countries=1)
+        print(f"  prior={prior} ({geolocator.last_num_scored}/{len(places)} lieux scorés)")
+        for city, prob in results:
+            print(f"    {city:20s} {prob*100:6.2f}%")
+
+
 if __name__ == "__main__":
 
     example_1_basic_usage()
@@ -0,0 +1,231 @@
+import csv
+import json
+import sys
+import hashlib
+from pathlib import Path
+from collections import Counter, defaultdict
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT / "dataset_2k_random_test" / "label_association"))
+
+from image_label_city_2k import extract_metadata_from_filename
+
+SPLIT_NAMES = ('train', 'val', 'test')
+
+
+def load_metadata_index(metadata_path, label_key, group_key=None):
+    """
+    Charge un index de métadonnées (CSV Kaggle ou JSON 2k)
+
+    Args:
+        metadata_path: dataset_metadata_kaggle.csv ou labels_city.json
+        label_key: Champ utilisé pour stratifier ('country' pour Kaggle ; 'city'
+            pour le 2k, qui n'a pas de champ pays et mélange villes, régions et pays)
+        group_key: Champ qui ne doit pas être coupé entre splits
+            (ex: 'flickr_user_id' pour éviter les fuites de photographe)
+
+    Returns:
+        (filenames, labels, groups) — groups vaut None si group_key est None
+    """
+    metadata_path = Path(metadata_path)
+
+    if metadata_path.suffix.lower() == '.json':
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            json_metadata = json.load(f)
+        records = [{'filename': filename, **info} for filename, info in json_metadata.items()]
+    else:
+        with open(metadata_path, 'r', newline='', encoding='utf-8') as f:
+            records = list(csv.DictReader(f))
+
+    # Ordre indépendant de l'ordre du fichier
+    records.sort(key=lambda r: r['filename'])
+
+    filenames = [r['filename'] for r in records]
+    labels = [r[label_key] for r in records]
+
+    groups = None
+    if group_key is not None:
+        groups = []
+        for r in records:
+            group = r.get(group_key)
+            if group is None:
+                # Pas dans l'index : on le retrouve depuis le nom de fichier Im2GPS
+                parsed = extract_metadata_from_filename(r['filename'])
+                group = parsed[group_key] if parsed else r['filename']
+            groups.append(group)
+
+    return filenames, labels, groups
+
+
+def build_splits(labels, groups=None, ratios=(0.8, 0.1, 0.1), seed=42):
+    """
+    Construit des splits train/val/test stratifiés par label
+
+    Si groups est fourni, toutes les images d'un même groupe vont dans le même
+    split ; le groupe est stratifié selon son label majoritaire. Le premier
+    groupe (après mélange) de chaque strate va toujours dans train, pour qu'aucun
+    label de val/test ne soit absent de train.
+
+    Args:
+        labels: Liste des labels (un par image)
+        groups: Liste optionnelle des groupes (un par image)
+        ratios: Proportions (train, val, test)
+        seed: Graine du mélange (même graine = mêmes splits)
+
+    Returns:
+        Dictionnaire {nom_du_split: np.ndarray int32 trié d'indices}
+    """
+    if groups is None:
+        groups = list(range(len(labels)))
+
+    members = defaultdict(list)
+    for idx, group in enumerate(groups):
+        members[group].append(idx)
+
+    # Chaque groupe est rangé dans la strate de son label majoritaire ; en cas
+    # d'égalité, le label le plus rare du dataset (qui n'aurait sinon aucune strate)
+    label_totals = Counter(labels)
+    strata = defaultdict(list)
+    for group, indices in members.items():
+        group_counts = Counter(labels[i] for i in indices)
+        label = min(group_counts,
+                    key=lambda l: (-group_counts[l], label_totals[l], str(l)))
+        strata[label].append(group)
+
+    ratios = np.asarray(ratios, dtype=float) / sum(ratios)
+    rng = np.random.default_rng(seed)
+    assigned = {name: [] for name in SPLIT_NAMES}
+
+    # Cibles cumulées sur toutes les strates : les arrondis des petites strates
+    # se compensent au lieu de toujours favoriser le même split
+    targets = np.zeros(len(SPLIT_NAMES))
+    counts = np.zeros(len(SPLIT_NAMES))
+
+    for label in sorted(strata, key=str):
+        stratum_groups = sorted(strata[label], key=str)
+        order = rng.permutation(len(stratum_groups))
+        targets += ratios * sum(len(members[g]) for g in stratum_groups)
+
+        for rank, position in enumerate(order):
+            group = stratum_groups[position]
+            if rank == 0:
+                split_id = 0
+            else:
+                # Le split le plus en retard sur sa cible reçoit le groupe
+                split_id = int(np.argmax(targets - counts))
+            assigned[SPLIT_NAMES[split_id]].extend(members[group])
+            counts[split_id] += len(members[group])
+
+    return {name: np.sort(np.asarray(indices, dtype=np.int32))
+            for name, indices in assigned.items()}
+
+
+def split_fingerprint(filenames, label_names, label_ids, splits):
+    """
+    Empreinte courte des splits (change si un fichier, un label ou une affectation change)
+    """
+    digest = hashlib.sha256()
+    for filename in filenames:
+        digest.update(filename.encode('utf-8'))
+        digest.update(b'\0')
+    for label in label_names:
+        digest.update(label.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(np.asarray(label_ids).astype('<i4').tobytes())
+    for name in SPLIT_NAMES:
+        digest.update(name.encode('utf-8'))
+        digest.update(splits[name].astype('<i4').tobytes())
+    return digest.hexdigest()[:16]
+
+
+def save_split_manifest(output_file, filenames, labels, splits, seed, ratios, group_key=None):
+    """
+    Sauvegarde les splits en .npz (indices entiers + labels encodés + empreinte)
+    """
+    label_names = sorted(set(labels))
+    label_to_id = {label: i for i, label in enumerate(label_names)}
+    label_ids = np.asarray([label_to_id[l] for l in labels], dtype=np.int32)
+    fingerprint = split_fingerprint(filenames, label_names, label_ids, splits)
+
+    np.savez_compressed(
+        output_file,
+        filenames=np.asarray(filenames),
+        label_names=np.asarray(label_names),
+        label_ids=label_ids,
+        fingerprint=np.asarray(fingerprint),
+        seed=np.asarray(seed),
+        ratios=np.asarray(ratios, dtype=float),
+        group_key=np.asarray(group_key or ''),
+        **splits
+    )
+
+    print(f" Splits sauvegardés: {output_file} (empreinte {fingerprint})")
+    for name in SPLIT_NAMES:
+        print(f"  - {name}: {len(splits[name])} images")
+    return fingerprint
+
+
+def load_split_manifest(manifest_file):
+    """
+    Recharge un manifeste de splits sans relire les métadonnées
+
+    Returns:
+        Dictionnaire avec filenames, label_names, label_ids, splits, fingerprint
+    """
+    with np.load(manifest_file) as data:
+        manifest = {
+            'filenames': data['filenames'].tolist(),
+            'label_names': data['label_names'].tolist(),
+            'label_ids': data['label_ids'],
+            'splits': {name: data[name] for name in SPLIT_NAMES},
+            'fingerprint': str(data['fingerprint']),
+            'seed': int(data['seed']),
+            'ratios': tuple(data['ratios'].tolist()),
+            'group_key': str(data['group_key']) or None
+        }
+
+    fingerprint = split_fingerprint(manifest['filenames'], manifest['label_names'],
+                                    manifest['label_ids'], manifest['splits'])
+    if fingerprint != manifest['fingerprint']:
+        raise ValueError(f"Empreinte invalide pour {manifest_file}")
+    return manifest
+
+
+def get_split(manifest, split_name):
+    """
+    Returns:
+        Liste de (filename, label) pour un split du manifeste
+    """
+    return [
+        (manifest['filenames'][i], manifest['label_names'][manifest['label_ids'][i]])
+        for i in manifest['splits'][split_name]
+    ]
+
+
+def main(metadata_path, output_file, label_key, group_key=None,
+         ratios=(0.8, 0.1, 0.1), seed=42):
+    """
+    Fonction principale
+    """
+    filenames, labels, groups = load_metadata_index(metadata_path, label_key, group_key)
+    splits = build_splits(labels, groups, ratios=ratios, seed=seed)
+    return save_split_manifest(output_file, filenames, labels, splits, seed, ratios, group_key)
+
+
+if __name__ == "__main__":
+    OUTPUT_DIR = Path(__file__).resolve().parent
+
+    # Kaggle : stratifié par pays
+    main(REPO_ROOT / "dataset_kaggle" / "label_association" / "dataset_metadata_kaggle.csv",
+         OUTPUT_DIR / "splits_kaggle.npz",
+         label_key='country')
+
+    # 2k Im2GPS : pas de champ pays dans l'index, seulement le champ 'city' qui
+    # mélange villes ("London", "nyc"), régions ("California") et pays ("France").
+    # On stratifie donc sur ce label tel quel ; un photographe Flickr reste dans un seul split
+    main(REPO_ROOT / "dataset_2k_random_test" / "label_association" / "labels_city.json",
+         OUTPUT_DIR / "splits_2k.npz",
+         label_key='city',
+         group_key='flickr_user_id')
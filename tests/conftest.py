@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Les dossiers du repo sont des scripts, pas des packages : on les ajoute au path
+for folder in ["Hugging_face_test", "dataset_split", "API_street_view_static"]:
+    sys.path.insert(0, str(REPO_ROOT / folder))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from build_splits import (SPLIT_NAMES, build_splits, get_split, load_split_manifest,
+                          save_split_manifest, split_fingerprint)
+
+
+def make_dataset():
+    """Labels déséquilibrés (dont des singletons) et groupes de 1 à 3 images"""
+    labels = []
+    groups = []
+    for label_id, count in enumerate([40, 25, 10, 3, 1, 1, 1]):
+        for i in range(count):
+            labels.append(f"label_{label_id}")
+            groups.append(f"user_{label_id}_{i // 3}")
+    return labels, groups
+
+
+def test_splits_are_deterministic():
+    labels, groups = make_dataset()
+    first = build_splits(labels, groups, seed=7)
+    second = build_splits(labels, groups, seed=7)
+    for name in SPLIT_NAMES:
+        assert np.array_equal(first[name], second[name])
+
+
+def test_splits_are_disjoint_and_cover_everything():
+    labels, groups = make_dataset()
+    splits = build_splits(labels, groups)
+    all_indices = np.concatenate([splits[name] for name in SPLIT_NAMES])
+    assert sorted(all_indices.tolist()) == list(range(len(labels)))
+    assert all(splits[name].dtype == np.int32 for name in SPLIT_NAMES)
+
+
+def test_groups_never_span_splits():
+    labels, groups = make_dataset()
+    splits = build_splits(labels, groups)
+    split_groups = {name: {groups[i] for i in splits[name]} for name in SPLIT_NAMES}
+    assert not split_groups['train'] & split_groups['val']
+    assert not split_groups['train'] & split_groups['test']
+    assert not split_groups['val'] & split_groups['test']
+
+
+def test_every_label_is_in_train():
+    labels, groups = make_dataset()
+    for seed in range(5):
+        splits = build_splits(labels, groups, seed=seed)
+        train_labels = {labels[i] for i in splits['train']}
+        assert train_labels == set(labels)
+
+
+def test_minority_label_in_tied_group_gets_its_own_stratum():
+    # Le groupe "u" a 1 image "common" et 1 image "rare" : "rare" doit aller dans train
+    labels = ["common"] * 10 + ["rare"]
+    groups = [f"g{i}" for i in range(9)] + ["u", "u"]
+    splits = build_splits(labels, groups)
+    assert 10 in splits['train']
+
+
+def test_manifest_roundtrip_and_fingerprint(tmp_path):
+    labels, groups = make_dataset()
+    filenames = [f"img_{i:03d}.jpg" for i in range(len(labels))]
+    splits = build_splits(labels, groups)
+
+    manifest_file = tmp_path / "splits.npz"
+    fingerprint = save_split_manifest(manifest_file, filenames, labels, splits, 42,
+                                      (0.8, 0.1, 0.1), 'user')
+    manifest = load_split_manifest(manifest_file)
+
+    assert manifest['fingerprint'] == fingerprint
+    assert manifest['group_key'] == 'user'
+    assert sorted(get_split(manifest, 'test')) == sorted(
+        (filenames[i], labels[i]) for i in splits['test'])
+
+
+def test_edited_labels_are_rejected(tmp_path):
+    labels, groups = make_dataset()
+    filenames = [f"img_{i:03d}.jpg" for i in range(len(labels))]
+    splits = build_splits(labels, groups)
+    manifest_file = tmp_path / "splits.npz"
+    save_split_manifest(manifest_file, filenames, labels, splits, 42, (0.8, 0.1, 0.1))
+
+    data = dict(np.load(manifest_file))
+    data['label_ids'] = (data['label_ids'] + 1) % len(data['label_names'])
+    np.savez(manifest_file, **data)
+
+    with pytest.raises(ValueError):
+        load_split_manifest(manifest_file)
+
+
+def test_fingerprint_depends_on_labels():
+    splits = {name: np.array([i], dtype=np.int32) for i, name in enumerate(SPLIT_NAMES)}
+    filenames = ["a.jpg", "b.jpg", "c.jpg"]
+    base = split_fingerprint(filenames, ["x", "y"], [0, 0, 1], splits)
+    assert split_fingerprint(filenames, ["x", "y"], [0, 1, 1], splits) != base
+    assert split_fingerprint(filenames, ["x", "z"], [0, 0, 1], splits) != base
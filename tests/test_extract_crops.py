@@ -0,0 +1,71 @@
+import pytest
+from PIL import Image
+
+from streetclip import StreetCLIPGeolocator, extract_crops
+
+
+@pytest.fixture
+def offsets_of(monkeypatch):
+    """Boîtes de crop demandées, et leur position le long du grand côté"""
+    def run(width, height, n_crops):
+        boxes = []
+        original_crop = Image.Image.crop
+
+        def recording_crop(self, box=None):
+            boxes.append(box)
+            return original_crop(self, box)
+
+        monkeypatch.setattr(Image.Image, "crop", recording_crop)
+        extract_crops(Image.new("RGB", (width, height)), n_crops)
+        monkeypatch.undo()
+
+        axis = 0 if width >= height else 1
+        return [box[axis] for box in boxes], boxes
+    return run
+
+
+def test_panorama_center_crop_first(offsets_of):
+    for n_crops in (2, 3, 4, 5):
+        offsets, _ = offsets_of(2048, 512, n_crops)
+        assert offsets[0] == (2048 - 512) // 2
+
+
+def test_panorama_crops_spread_on_both_sides(offsets_of):
+    offsets, _ = offsets_of(2048, 512, 4)
+    assert offsets == [768, 384, 0, 1536]
+
+    offsets, _ = offsets_of(2048, 512, 3)
+    assert offsets == [768, 0, 1536]
+
+
+def test_panorama_crop_budget_is_capped(offsets_of):
+    # 2:1 : au plus 3 positions différentes
+    offsets, _ = offsets_of(1024, 512, 10)
+    assert offsets == [256, 0, 512]
+
+
+def test_tall_image_crops_vertically(offsets_of):
+    offsets, boxes = offsets_of(512, 2048, 3)
+    assert offsets == [768, 0, 1536]
+    assert all(box[0] == 0 and box[2] == 512 for box in boxes)
+
+
+def test_square_image_center_then_corners(offsets_of):
+    _, boxes = offsets_of(1000, 1000, 5)
+    assert boxes[0] == (0, 0, 1000, 1000)
+    assert boxes[1:] == [(0, 0, 800, 800), (200, 0, 1000, 800),
+                         (0, 200, 800, 1000), (200, 200, 1000, 1000)]
+
+
+def test_single_crop_is_centered_square():
+    crops = extract_crops(Image.new("RGB", (2048, 512)), 1)
+    assert len(crops) == 1
+    assert crops[0].size == (512, 512)
+
+
+def test_unknown_aggregation_raises():
+    # Pas besoin du modèle : la validation a lieu avant tout calcul
+    geolocator = StreetCLIPGeolocator.__new__(StreetCLIPGeolocator)
+    with pytest.raises(ValueError):
+        geolocator.predict_location(Image.new("RGB", (64, 64)), ["Paris"], tta=True,
+                                    aggregation="median")
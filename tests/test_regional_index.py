@@ -0,0 +1,87 @@
+import random
+import zlib
+
+import numpy as np
+import pytest
+import torch
+
+from regional_index import RegionalLabelIndex
+
+
+class FakeGeolocator:
+    """Encode chaque texte en un vecteur aléatoire fixe (pas de modèle à charger)"""
+
+    def encode_text(self, texts):
+        embeds = torch.stack([
+            torch.randn(16, generator=torch.Generator().manual_seed(zlib.crc32(t.encode())))
+            for t in texts
+        ])
+        return embeds / embeds.norm(dim=-1, keepdim=True)
+
+
+def make_places():
+    rng = random.Random(0)
+    places = []
+    # Zone très dense (une seule cellule de départ) + lieux dispersés + Fidji
+    for i in range(600):
+        places.append({'label': f"Paris {i}", 'country': "France",
+                       'lat': rng.uniform(48.0, 49.5), 'lon': rng.uniform(1.5, 3.5)})
+    for i in range(200):
+        places.append({'label': f"Lieu {i}", 'country': f"Pays {i % 7}",
+                       'lat': rng.uniform(-60, 70), 'lon': rng.uniform(-180, 180)})
+    places.append({'label': "Suva", 'country': "Fiji", 'lat': -18.1, 'lon': 178.4})
+    places.append({'label': "Lambasa", 'country': "Fiji", 'lat': -16.4, 'lon': -179.6})
+    return places
+
+
+@pytest.fixture(scope="module")
+def index():
+    return RegionalLabelIndex(FakeGeolocator(), make_places(), max_leaf_size=50)
+
+
+def leaves_of(index):
+    return [node for node, children in enumerate(index.node_children) if not children]
+
+
+def test_leaves_are_capped_and_cover_every_label(index):
+    leaves = leaves_of(index)
+    assert all(index.num_labels([leaf]) <= index.max_leaf_size for leaf in leaves)
+    assert sorted(index.order) == list(range(len(index.labels)))
+    assert index.num_labels(leaves) == len(index.labels)
+
+
+def test_ordered_matrix_is_in_leaf_order(index):
+    assert torch.equal(index.ordered_embeds, index.label_embeds[index.label_order])
+    assert index.ordered_embeds.is_contiguous()
+
+
+def test_scored_labels_are_bounded(index):
+    image_embeds = FakeGeolocator().encode_text(["Paris 3"])
+    leaves = index.select_leaves(image_embeds, prior="France", top_cells=2)
+    similarities = index.leaf_similarities(image_embeds, leaves)
+
+    assert similarities.shape[1] == index.num_labels(leaves) <= 2 * index.max_leaf_size
+    for position in range(similarities.shape[1]):
+        assert index.label_at(leaves, position).startswith("Paris")
+
+
+def test_cells_in_bbox_across_antimeridian(index):
+    cells = index.cells_in_bbox(-25, -10, 170, -170)
+    assert index.cell_of(-18.1, 178.4) in cells
+    assert index.cell_of(-16.4, -179.6) in cells
+    for cell in cells:
+        _, _, lon_min, lon_max = index.node_bounds[index.cell_nodes[cell]]
+        assert lon_max >= 170 or lon_min <= -170
+
+
+def test_numpy_bbox_prior(index):
+    image_embeds = FakeGeolocator().encode_text(["Suva"])
+    leaves = index.select_leaves(image_embeds, prior=np.array([-25.0, -10.0, 170.0, -170.0]))
+    labels = {index.label_at(leaves, p) for p in range(index.num_labels(leaves))}
+    assert {"Suva", "Lambasa"} <= labels
+
+
+def test_unknown_prior_falls_back_to_all_cells(index):
+    image_embeds = FakeGeolocator().encode_text(["Lieu 0"])
+    leaves = index.select_leaves(image_embeds, prior="Atlantide", top_cells=3)
+    assert 0 < index.num_labels(leaves) <= 3 * index.max_leaf_size
@@ -0,0 +1,91 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from tile_store import ReplayServer, TileStore, location_key, tile_key
+
+
+def status_of(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_keys_ignore_sign_of_zero():
+    assert tile_key(-0.000001, -0.0, 0) == tile_key(0.0, 0.000001, 0)
+    assert location_key(-0.0, -0.0) == "0.00000|0.00000"
+
+
+def test_keys_wrap_longitude():
+    assert location_key(10, 180) == location_key(10, -180) == "10.00000|-180.00000"
+    assert location_key(10, 179.999999) == location_key(10, -180)
+    assert tile_key(10, 190, 0) == tile_key(10, -170, 0)
+    assert tile_key(10, 5, 370) == tile_key(10, 5, 10)
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = TileStore(tmp_path)
+    first = store.put(1.0, 2.0, 0, 0, 90, "640x640", b"jpeg")
+    second = store.put(1.0, 2.0, 90, 0, 90, "640x640", b"jpeg")
+
+    assert first == second
+    assert len(store) == 2
+    assert sum(len(files) for _, _, files in os.walk(tmp_path / "objects")) == 1
+
+
+def test_index_is_replayed_and_truncated_line_skipped(tmp_path):
+    store = TileStore(tmp_path)
+    store.put(1.0, 2.0, 0, 0, 90, "640x640", b"old")
+    store.put(1.0, 2.0, 0, 0, 90, "640x640", b"new")
+    store.put_location_metadata(1.0, 2.0, {"status": "OK"})
+    with open(store.index_file, 'a') as f:
+        f.write('{"kind": "tiles", "key": ')
+
+    reloaded = TileStore(tmp_path)
+    assert reloaded.get(1.0, 2.0, 0) == b"new"
+    assert reloaded.get_location_metadata(1.0, 2.0) == {"status": "OK"}
+
+    reloaded.put(3.0, 4.0, 0, 0, 90, "640x640", b"after")
+    assert TileStore(tmp_path).get(3.0, 4.0, 0) == b"after"
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = TileStore(tmp_path)
+    store.put(48.85661, 2.35222, 90, 0, 90, "640x640", b"paris")
+    with ReplayServer(store) as server:
+        yield server
+
+
+def test_replay_server_hit_miss_and_errors(server):
+    base = server.base_url
+    assert status_of(f"{base}?location=48.85661,2.35222&heading=90") == (200, b"paris")
+    assert status_of(f"{base}?location=48.85661,2.35222&heading=180")[0] == 404
+    assert status_of(f"{base}?location=Paris")[0] == 400
+    assert status_of(f"{base}?location=48.8,abc")[0] == 400
+    assert status_of(f"{base}?heading=90")[0] == 400
+    assert status_of(f"{base}/metadata")[0] == 400
+
+    assert server.stats == {"requests": 6, "hits": 1, "misses": 1, "errors": 4}
+
+
+def test_concurrent_replay_gives_unique_ids(tmp_path):
+    from streetview_collector import StreetViewDatasetCollector
+
+    store = TileStore(tmp_path / "store")
+    for heading in range(0, 360, 30):
+        store.put(10.0, 20.0, heading, 0, 90, "640x640", f"tile {heading}".encode())
+        store.put_location_metadata(10.0, 20.0, {"status": "OK"})
+
+    with ReplayServer(store) as server:
+        collector = StreetViewDatasetCollector(api_key="replay", cost_per_image=0.0,
+                                               base_url=server.base_url,
+                                               dataset_dir=str(tmp_path / "replay"))
+        assert collector.replay_from_store(store, workers=4) == 12
+
+    assert collector.tracker["images_downloaded"] == 12
+    assert len(os.listdir(collector.images_dir)) == 12